@@ -1,12 +1,17 @@
 # app.py
-import os, uuid
-from flask import Flask, jsonify, request, send_from_directory, redirect, session
+import os, uuid, mimetypes
+from urllib.parse import quote, urlencode
+from flask import Flask, jsonify, request, send_from_directory, redirect, session, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
-from models import init_db, SessionLocal, Upload, User
-from storage import save_image, UPLOAD_ROOT
+from models import init_db, SessionLocal, Upload, User, ArchivedUpload
+from storage import (
+    save_image, shard_path, resolve_path, ensure_parent, csv_lock,
+    UPLOAD_ROOT, DUMMY_S3_ROOT, DUMMY_SQL_CSV, COLD_CACHE_ROOT
+)
+from archive import find_archived, restore_archived_file, archived_uploads, archived_pig_summary
 from auth import (
-    create_jwt_token, verify_jwt_token, 
+    create_jwt_token, verify_jwt_token, sign_file_path, verify_file_signature,
     get_user_by_id, get_user_by_farmer_id, get_user_by_email, create_user_from_oauth
 )
 from oauth_service import oauth_service
@@ -45,7 +50,7 @@ app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB cap
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", secrets.token_hex(32))
 # Flask-Session config
 app.config["SESSION_TYPE"] = "filesystem"
-app.config["SESSION_FILE_DIR"] = "/home/kristian/kameraveiing_data_collector/backend/flask_session"
+app.config["SESSION_FILE_DIR"] = os.getenv("SESSION_FILE_DIR", "/home/kristian/kameraveiing_data_collector/backend/flask_session")
 app.config["SESSION_PERMANENT"] = False
 app.config["SESSION_USE_SIGNER"] = True
 app.config["SESSION_KEY_PREFIX"] = "kameraveiing:"
@@ -60,6 +65,22 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:4200", "http://172.17
 
 init_db()
 
+# File delivery for /files/<rel>:
+#   python  - Flask streams the file (wsgi.file_wrapper, Range support)
+#   x-accel - Flask only authorizes; nginx serves the file from an internal location.
+#             Only for requests nginx marked with X_ACCEL_HEADER: direct hits on the
+#             backend port fall back to python, nothing would follow the redirect
+FILE_DELIVERY = os.getenv("FILE_DELIVERY", "python")
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/protected-uploads/")
+X_ACCEL_COLD_PREFIX = os.getenv("X_ACCEL_COLD_PREFIX", "/protected-cold/")
+X_ACCEL_HEADER = os.getenv("X_ACCEL_HEADER", "X-Accel-Enabled")
+FILE_CACHE_MAX_AGE = int(os.getenv("FILE_CACHE_MAX_AGE", "3600"))
+
+def file_url(rel_path):
+    """Signed, expiring URL for a stored image"""
+    expires, sig = sign_file_path(rel_path)
+    return f"/files/{quote(rel_path)}?{urlencode({'expires': expires, 'sig': sig})}"
+
 def get_current_user():
     """Get current user from JWT token, OAuth token, or session (backward compatibility)"""
     # Check for JWT token in Authorization header
@@ -182,29 +203,29 @@ def create_upload():
             pass
         uploader = user.full_name if user and hasattr(user, "full_name") else (user.user_id if user and hasattr(user, "user_id") else "unknown")
 
-        # Save image to dummy S3
-        import os
-        s3_dir = os.path.join(os.path.dirname(__file__), "dummy_s3")
-        os.makedirs(s3_dir, exist_ok=True)
-        image.save(os.path.join(s3_dir, filename))
+        # Save image to dummy S3 (sharded per UPLOAD_LAYOUT)
+        rel_path = shard_path(filename, user.farmer_id if user else None, now)
+        image.save(ensure_parent(DUMMY_S3_ROOT, rel_path))
 
         # Save tabular data to dummy Azure SQL (CSV file)
         import csv
-        csv_path = os.path.join(os.path.dirname(__file__), "dummy_azure_sql.csv")
+        csv_path = DUMMY_SQL_CSV
         header = ["filename", "weight", "date", "timestamp", "uploader"]
-        file_exists = os.path.isfile(csv_path)
-        need_header = True
-        if file_exists:
-            with open(csv_path, "r") as f:
-                first_line = f.readline().strip()
-                if first_line == ",".join(header):
-                    need_header = False
-
-        with open(csv_path, "a", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            if need_header:
-                writer.writerow(header)
-            writer.writerow([filename, weight, date, timestamp, uploader])
+        # migrate_layout.py and reconcile.py swap the file out under the same lock
+        with csv_lock(csv_path):
+            file_exists = os.path.isfile(csv_path)
+            need_header = True
+            if file_exists:
+                with open(csv_path, "r") as f:
+                    first_line = f.readline().strip()
+                    if first_line == ",".join(header):
+                        need_header = False
+
+            with open(csv_path, "a", newline="") as csvfile:
+                writer = csv.writer(csvfile)
+                if need_header:
+                    writer.writerow(header)
+                writer.writerow([rel_path, weight, date, timestamp, uploader])
 
         return {
             "status": "ok",
@@ -368,7 +389,7 @@ def get_user():
             "pig_uid": u.pig_uid,
             "user_id": u.user_id,
             "picture_number": u.picture_number,
-            "image_url": f"/files/{rel_path}", 
+            "image_url": file_url(rel_path), 
             "weight": u.weight_kg
         }, 201
     except ValueError as e:
@@ -388,6 +409,8 @@ def list_uploads():
         ).order_by(Upload.created_at.desc()).limit(100).all()
     finally:
         db.close()
+    # Everything archived is older than the hot rows, so only look there if we run short
+    archived = archived_uploads(user.farmer_id, 100 - len(rows)) if len(rows) < 100 else []
     
     return jsonify([
         {
@@ -395,11 +418,12 @@ def list_uploads():
             "pig_uid": r.pig_uid,
             "user_id": r.user_id,
             "picture_number": r.picture_number,
-            "image_url": f"/files/{r.filename}", 
+            "image_url": file_url(r.filename), 
             "weight": r.weight_kg, 
-            "created_at": r.created_at.isoformat()
+            "created_at": r.created_at.isoformat(),
+            "archived": isinstance(r, ArchivedUpload)
         }
-        for r in rows
+        for r in rows + archived
     ])
 
 @app.route("/api/pigs", methods=['GET'])
@@ -419,25 +443,80 @@ def list_pigs():
         ).filter(
             Upload.user_id == user.farmer_id
         ).group_by(Upload.pig_uid, Upload.user_id, Upload.weight_kg).all()
+
+        # Fold in pictures that have moved to the archive
+        pigs = {}
+        for row in list(pig_data) + list(archived_pig_summary(user.farmer_id)):
+            key = (row.pig_uid, row.user_id, row.weight_kg)
+            count, latest = pigs.get(key, (0, row.latest_upload))
+            pigs[key] = (count + row.picture_count, max(latest, row.latest_upload))
         
         return jsonify([
             {
-                "pig_uid": row.pig_uid,
-                "user_id": row.user_id,
-                "weight": row.weight_kg,
-                "picture_count": row.picture_count,
-                "latest_upload": row.latest_upload.isoformat()
+                "pig_uid": pig_uid,
+                "user_id": user_id,
+                "weight": weight_kg,
+                "picture_count": count,
+                "latest_upload": latest.isoformat()
             }
-            for row in pig_data
+            for (pig_uid, user_id, weight_kg), (count, latest) in pigs.items()
         ])
     finally:
         db.close()
 
-# serve images (dev-only)
+def can_read_file(rel, resolved):
+    """Signed URL, or a logged-in farmer who owns the upload. Returns an HTTP status."""
+    if request.args.get("sig"):
+        return 200 if verify_file_signature(rel, request.args.get("expires"), request.args.get("sig")) else 403
+    user = get_current_user()
+    if not user:
+        return 401
+    db = SessionLocal()
+    try:
+        owned = db.query(Upload.id).filter(
+            Upload.filename.in_({rel, resolved}),
+            Upload.user_id == user.farmer_id
+        ).first()
+    finally:
+        db.close()
+    if not owned:
+        owned = find_archived({rel, resolved}, user.farmer_id)
+    return 200 if owned else 403
+
+# serve images
 @app.route("/files/<path:rel>", methods=['GET'])
 def files(rel):
     safe_root = os.path.abspath(UPLOAD_ROOT)
-    return send_from_directory(safe_root, rel, as_attachment=False)
+    # Rows written before a layout migration may still carry the old path
+    resolved = resolve_path(safe_root, rel)
+    # Authorize before revealing whether the file exists
+    status = can_read_file(rel, resolved or rel)
+    if status == 401:
+        return {"error": "Authentication required"}, 401
+    if status == 403:
+        return {"error": "Forbidden"}, 403
+    prefix = X_ACCEL_PREFIX
+    if not resolved:
+        # Archived: pull it out of cold storage into the cache on first read
+        if not restore_archived_file(rel):
+            return {"error": "Not found"}, 404
+        safe_root, resolved, prefix = os.path.abspath(COLD_CACHE_ROOT), rel, X_ACCEL_COLD_PREFIX
+
+    if FILE_DELIVERY == "x-accel" and request.headers.get(X_ACCEL_HEADER) == "1":
+        # nginx does the I/O (sendfile, Range, HEAD); the worker is free immediately
+        response = Response(status=200)
+        response.headers["X-Accel-Redirect"] = prefix + quote(resolved)
+        response.headers["Content-Type"] = mimetypes.guess_type(resolved)[0] or "application/octet-stream"
+        response.headers["Cache-Control"] = f"private, max-age={FILE_CACHE_MAX_AGE}"
+        return response
+
+    # send_from_directory hands the file to wsgi.file_wrapper and answers Range/conditional requests
+    response = send_from_directory(safe_root, resolved, as_attachment=False, conditional=True,
+                                   max_age=FILE_CACHE_MAX_AGE)
+    # Photos are per-farmer: browsers may cache them, shared proxies may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 if __name__ == "__main__":
     os.makedirs("data/uploads", exist_ok=True)
@@ -0,0 +1,202 @@
+# archive.py - Hot/cold tiering of old uploads
+#
+# Moves Upload rows older than a cutoff out of the hot database into the
+# uploads_archive table (ARCHIVE_DATABASE_URL), and their images out of UPLOAD_ROOT
+# into compressed, immutable pack objects under COLD_STORAGE_DIR (one pack per
+# month per batch). The API keeps resolving archived rows and images, but only
+# touches the archive when the hot tier can't answer:
+#   * /files/<rel> restores an archived image into COLD_CACHE_DIR on first read;
+#     every run of this job trims that cache to COLD_CACHE_MAX_MB, dropping images
+#     not read for COLD_CACHE_MAX_AGE_DAYS first
+#   * /api/uploads tops up from the archive when the hot rows run out
+#   * /api/pigs merges per-farmer archive totals, cached until the next archive batch
+#
+# Each batch is packed and fsynced, then archived, then deleted from the hot tier,
+# so a crash at any point leaves every row readable; re-running picks up the rest.
+#
+# Usage (from the backend directory):
+#   python archive.py                        # archive uploads older than ARCHIVE_AFTER_DAYS
+#   python archive.py --days 180 --dry-run
+#   python archive.py --cache-only           # only trim COLD_CACHE_DIR (e.g. hourly from cron)
+import argparse
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+
+from models import SessionLocal, ArchiveSessionLocal, Upload, ArchivedUpload, init_db
+from storage import (
+    UPLOAD_ROOT, COLD_CACHE_MAX_MB, COLD_CACHE_MAX_AGE_DAYS, resolve_path, write_cold_pack, restore_cold,
+    evict_cold_cache
+)
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))
+BATCH_SIZE = 2000
+
+# ============================================================================
+# TIERING JOB
+# ============================================================================
+
+def archive_uploads(cutoff: datetime, batch_size: int = BATCH_SIZE, dry_run: bool = False) -> dict:
+    """Move uploads created before `cutoff` to the cold tier"""
+    root = os.path.abspath(UPLOAD_ROOT)
+    stats = {"rows": 0, "files": 0, "missing_files": 0, "packs": 0}
+    db = SessionLocal()
+    adb = ArchiveSessionLocal()
+    try:
+        if dry_run:
+            stats["rows"] = db.query(func.count(Upload.id)).filter(Upload.created_at < cutoff).scalar()
+            return stats
+
+        while True:
+            # Archived rows leave the table, so the oldest remaining batch is always next
+            rows = db.query(Upload).filter(
+                Upload.created_at < cutoff
+            ).order_by(Upload.created_at, Upload.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            # 1. Pack images per month into new cold objects
+            by_month = defaultdict(list)
+            hot_paths = {}
+            for r in rows:
+                resolved = resolve_path(root, r.filename)
+                if resolved:
+                    hot_paths[r.id] = resolved
+                    by_month[f"{r.created_at:%Y-%m}"].append((r.filename, os.path.join(root, *resolved.split("/"))))
+            cold_keys = {}
+            for month, members in by_month.items():
+                key, packed = write_cold_pack(month, members)
+                cold_keys.update({filename: key for filename in packed})
+                stats["packs"] += 1
+
+            # 2. Archive rows (a crashed earlier run may already have archived some)
+            ids = [r.id for r in rows]
+            existing = {i for (i,) in adb.query(ArchivedUpload.id).filter(ArchivedUpload.id.in_(ids))}
+            now = datetime.utcnow()
+            for r in rows:
+                archived = ArchivedUpload(
+                    id=r.id,
+                    pig_uid=r.pig_uid,
+                    user_id=r.user_id,
+                    picture_number=r.picture_number,
+                    filename=r.filename,
+                    weight_kg=r.weight_kg,
+                    created_at=r.created_at,
+                    archived_at=now,
+                    cold_key=cold_keys.get(r.filename),
+                )
+                if r.id in existing:
+                    adb.merge(archived)
+                else:
+                    adb.add(archived)
+            adb.commit()
+
+            # 3. Drop them from the hot tier
+            db.query(Upload).filter(Upload.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            for r in rows:
+                if r.filename in cold_keys:
+                    try:
+                        os.remove(os.path.join(root, *hot_paths[r.id].split("/")))
+                    except FileNotFoundError:
+                        pass
+
+            stats["rows"] += len(rows)
+            stats["files"] += len(cold_keys)
+            stats["missing_files"] += len(rows) - len(cold_keys)
+    finally:
+        db.close()
+        adb.close()
+    return stats
+
+# ============================================================================
+# LAZY LOOKUPS (used by app.py when the hot tier has no answer)
+# ============================================================================
+
+def find_archived(filenames, farmer_id: str = None) -> Optional[ArchivedUpload]:
+    """Archived upload stored under any of `filenames`, optionally owned by farmer_id"""
+    adb = ArchiveSessionLocal()
+    try:
+        query = adb.query(ArchivedUpload).filter(ArchivedUpload.filename.in_(set(filenames)))
+        if farmer_id is not None:
+            query = query.filter(ArchivedUpload.user_id == farmer_id)
+        return query.first()
+    finally:
+        adb.close()
+
+def restore_archived_file(rel_path: str) -> Optional[str]:
+    """Absolute path of an archived image, restoring it from cold storage if needed"""
+    archived = find_archived([rel_path])
+    if not archived or not archived.cold_key:
+        return None
+    return restore_cold(archived.cold_key, archived.filename)
+
+def archived_uploads(farmer_id: str, limit: int) -> list[ArchivedUpload]:
+    """Newest archived uploads for a farmer"""
+    adb = ArchiveSessionLocal()
+    try:
+        return adb.query(ArchivedUpload).filter(
+            ArchivedUpload.user_id == farmer_id
+        ).order_by(ArchivedUpload.created_at.desc()).limit(limit).all()
+    finally:
+        adb.close()
+
+# farmer_id -> (archive generation, rows)
+_pig_summary_cache: dict[str, tuple[Optional[datetime], list]] = {}
+
+def archived_pig_summary(farmer_id: str) -> list:
+    """
+    Per-pig picture counts in the archive. They only change when the job archives a
+    batch, which stamps archived_at, so the cache is keyed on max(archived_at) (an
+    index lookup) and is never stale once the rows have left the hot tier.
+    """
+    adb = ArchiveSessionLocal()
+    try:
+        generation = adb.query(func.max(ArchivedUpload.archived_at)).scalar()
+        cached = _pig_summary_cache.get(farmer_id)
+        if cached and cached[0] == generation:
+            return cached[1]
+
+        rows = adb.query(
+            ArchivedUpload.pig_uid,
+            ArchivedUpload.user_id,
+            ArchivedUpload.weight_kg,
+            func.count(ArchivedUpload.id).label('picture_count'),
+            func.max(ArchivedUpload.created_at).label('latest_upload')
+        ).filter(
+            ArchivedUpload.user_id == farmer_id
+        ).group_by(ArchivedUpload.pig_uid, ArchivedUpload.user_id, ArchivedUpload.weight_kg).all()
+    finally:
+        adb.close()
+    _pig_summary_cache[farmer_id] = (generation, rows)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old uploads to the cold tier")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="Archive uploads older than this")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+    parser.add_argument("--cache-only", action="store_true", help="Only trim the restored-image cache")
+    parser.add_argument("--cache-max-mb", type=int, default=COLD_CACHE_MAX_MB)
+    parser.add_argument("--cache-max-age-days", type=int, default=COLD_CACHE_MAX_AGE_DAYS)
+    args = parser.parse_args()
+
+    init_db()
+    if not args.cache_only:
+        cutoff = datetime.utcnow() - timedelta(days=args.days)
+        started = time.perf_counter()
+        stats = archive_uploads(cutoff, args.batch_size, args.dry_run)
+        if args.dry_run:
+            print(f"🧊 {stats['rows']} uploads older than {cutoff:%Y-%m-%d} would be archived")
+        else:
+            print(f"🧊 Archived {stats['rows']} uploads older than {cutoff:%Y-%m-%d}: {stats['files']} images "
+                  f"in {stats['packs']} packs, {stats['missing_files']} without a file "
+                  f"({time.perf_counter() - started:.1f}s)")
+    if not args.dry_run:
+        cache = evict_cold_cache(args.cache_max_mb * 1024 * 1024, args.cache_max_age_days * 86400)
+        print(f"🧹 Cold cache: evicted {cache['evicted']} images ({cache['evicted_bytes'] / 1048576:.1f} MiB), "
+              f"kept {cache['files']} ({cache['bytes'] / 1048576:.1f} MiB)")
@@ -1,6 +1,10 @@
 # auth.py - OAuth-compatible authentication utilities
 import jwt
+import hmac
+import hashlib
+import base64
 import secrets
+import time
 import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
@@ -13,6 +17,10 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'your-super-secure-secret-key-change-in-pro
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
+# Signed /files URLs (usable from <img src>, which can't send an Authorization header)
+FILE_URL_SECRET = os.getenv('FILE_URL_SECRET', JWT_SECRET)
+FILE_URL_TTL_SECONDS = int(os.getenv('FILE_URL_TTL_SECONDS', '3600'))
+
 def generate_farmer_id() -> str:
     """Generate a unique farmer ID for new users"""
     return f"F{secrets.token_hex(4).upper()}"
@@ -37,6 +45,26 @@ def verify_jwt_token(token: str) -> Optional[dict]:
     except jwt.InvalidTokenError:
         return None
 
+def _file_signature(rel_path: str, expires: int) -> str:
+    digest = hmac.new(FILE_URL_SECRET.encode(), f"{rel_path}:{expires}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+def sign_file_path(rel_path: str, ttl_seconds: int = FILE_URL_TTL_SECONDS) -> tuple[int, str]:
+    """Return (expires, signature) for a time-limited /files URL"""
+    # Round expiry up to the next window so URLs stay identical (and cacheable) for a while
+    expires = (int(time.time()) // ttl_seconds + 2) * ttl_seconds
+    return expires, _file_signature(rel_path, expires)
+
+def verify_file_signature(rel_path: str, expires: str, signature: str) -> bool:
+    """Check a signed /files URL"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_file_signature(rel_path, expires), signature or "")
+
 def get_user_by_id(user_id: str) -> Optional[User]:
     """Get user by their UUID"""
     db = SessionLocal()
@@ -0,0 +1,8 @@
+# bench/__init__.py - Offline benchmark and load-test suite
+#
+# Run from the backend directory:
+#   python -m bench --rows 1000000 --out bench_report.json
+#   python -m bench --baseline bench_baseline.json
+#
+# Everything runs against a throwaway work directory and a local stand-in
+# for Animalia SSO, so no network access or real credentials are needed.
@@ -0,0 +1,165 @@
+# bench/__main__.py - Benchmark CLI: python -m bench [options]
+import argparse
+import io
+import logging
+import random
+import sys
+import threading
+import time
+
+from bench import env
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Offline benchmarks for the backend")
+    parser.add_argument("--workdir", help="Work directory (default: fresh temp dir)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Upload rows to seed")
+    parser.add_argument("--users", type=int, default=100, help="Farmers to seed")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per microbenchmark")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads per load scenario")
+    parser.add_argument("--image-size", default="1280x960", help="Synthetic image WIDTHxHEIGHT")
+    parser.add_argument("--sso-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8766)
+    parser.add_argument("--only", help="Comma-separated scenario name prefixes to run")
+    parser.add_argument("--skip-load", action="store_true", help="Only run in-process microbenchmarks")
+    parser.add_argument("--out", default="bench_report.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Saved report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = env.configure(args.workdir, sso_url=f"http://127.0.0.1:{args.sso_port}")
+    # Per-request access logs from the local servers would drown the results
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    # Import only after env.configure(): these read their config at import time
+    import requests
+    from werkzeug.datastructures import FileStorage
+    from werkzeug.serving import make_server
+    from bench.fake_sso import FakeSSO
+    from bench.images import synthetic_image, image_stream
+    from bench.report import measure, measure_concurrent, build_report, write_report, compare, print_table
+    from bench.seed import seed_users, seed_uploads
+    from models import engine
+    from app import app, file_url, FILE_DELIVERY, X_ACCEL_HEADER
+    from auth import create_jwt_token
+    from oauth_service import oauth_service
+    from storage import save_image
+
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    rng = random.Random(args.seed)
+    wanted = [p for p in (args.only or "").split(",") if p]
+    selected = lambda name: not wanted or any(name.startswith(p) for p in wanted)
+    results = {}
+
+    def run(name, fn):
+        if selected(name):
+            print(f"▶ {name}", file=sys.stderr)
+            results[name] = fn()
+
+    sso = FakeSSO(port=args.sso_port).start()
+    print(f"Work directory: {workdir}", file=sys.stderr)
+    try:
+        users = seed_users(engine, args.users)
+        seed_rate = seed_uploads(engine, args.rows, n_users=args.users, seed=args.seed)
+        print(f"Seeded {args.rows} uploads ({seed_rate:,.0f} rows/s)", file=sys.stderr)
+
+        jwt_headers = [{"Authorization": f"Bearer {create_jwt_token(u['id'], u['farmer_id'])}"} for u in users]
+        sso_tokens = [sso.issue_token(u["farmer_id"]) for u in users]
+        images = {fmt: synthetic_image(fmt, width, height, args.seed) for fmt in ("jpeg", "png", "webp")}
+        uploads = list(image_stream(32, "jpeg", width, height, args.seed))
+        client = app.test_client()
+
+        # ---------------- Microbenchmarks (in-process) ----------------
+        for fmt, raw in images.items():
+            def bench_save(i, raw=raw):
+                save_image(FileStorage(stream=io.BytesIO(raw)), 80.0, f"bench{i % 50}", i, "F0000001")
+            run(f"save_image.{fmt}", lambda: measure(bench_save, args.iterations))
+
+        # FILE_DELIVERY=x-accel makes these measure authorization only (as if behind nginx)
+        rel_path, _ = save_image(FileStorage(stream=io.BytesIO(images["jpeg"])), 80.0, "files", 1, "F0000001")
+        signed_url = file_url(rel_path)
+        file_headers = {X_ACCEL_HEADER: "1"} if FILE_DELIVERY == "x-accel" else {}
+        run("files.signed_url", lambda: measure(
+            lambda i: client.get(signed_url, headers=file_headers).status_code == 200, args.iterations))
+
+        def bench_create_upload(i):
+            filename, raw, weight = uploads[i % len(uploads)]
+            resp = client.post("/api/upload", data={"image": (io.BytesIO(raw), filename), "weight": str(weight)},
+                               content_type="multipart/form-data")
+            return resp.status_code == 201
+        run("create_upload", lambda: measure(bench_create_upload, args.iterations))
+
+        run("list_pigs", lambda: measure(
+            lambda i: client.get("/api/pigs", headers=rng.choice(jwt_headers)).status_code == 200, args.iterations))
+        run("list_uploads", lambda: measure(
+            lambda i: client.get("/api/uploads", headers=rng.choice(jwt_headers)).status_code == 200, args.iterations))
+        run("oauth.verify_access_token", lambda: measure(
+            lambda i: oauth_service.verify_access_token(rng.choice(sso_tokens)) is not None, args.iterations))
+        run("oauth.get_user_info", lambda: measure(
+            lambda i: oauth_service.get_user_info_from_token(rng.choice(sso_tokens)) is not None, args.iterations))
+
+        # ---------------- Load scenarios (live HTTP server) ----------------
+        if not args.skip_load:
+            server = make_server("127.0.0.1", args.app_port, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = f"http://127.0.0.1:{args.app_port}"
+            local = threading.local()
+
+            def http():
+                if not hasattr(local, "session"):
+                    local.session = requests.Session()
+                return local.session
+
+            def load_upload(i):
+                filename, raw, weight = uploads[i % len(uploads)]
+                resp = http().post(f"{base}/api/upload", files={"image": (filename, raw)}, data={"weight": str(weight)})
+                return resp.status_code == 201
+
+            try:
+                run("load.create_upload", lambda: measure_concurrent(load_upload, args.requests, args.concurrency))
+                run("load.files.signed_url", lambda: measure_concurrent(
+                    lambda i: len(http().get(f"{base}{signed_url}", headers=file_headers).content) > 0 or FILE_DELIVERY == "x-accel",
+                    args.requests, args.concurrency))
+                run("load.list_pigs", lambda: measure_concurrent(
+                    lambda i: http().get(f"{base}/api/pigs", headers=jwt_headers[i % len(jwt_headers)]).ok,
+                    args.requests, args.concurrency))
+                # Bearer tokens from the SSO go through /userinfo on every request
+                run("load.list_pigs.sso_token", lambda: measure_concurrent(
+                    lambda i: http().get(f"{base}/api/pigs",
+                                         headers={"Authorization": f"Bearer {sso_tokens[i % len(sso_tokens)]}"}).ok,
+                    args.requests, args.concurrency))
+                run("load.list_uploads", lambda: measure_concurrent(
+                    lambda i: http().get(f"{base}/api/uploads", headers=jwt_headers[i % len(jwt_headers)]).ok,
+                    args.requests, args.concurrency))
+            finally:
+                server.shutdown()
+    finally:
+        sso.stop()
+
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "workdir")}
+    report = build_report(results, params)
+    write_report(report, args.out)
+    print_table(results)
+    print(f"Report written to {args.out}")
+
+    if args.baseline:
+        try:
+            regressions = compare(report, args.baseline, args.tolerance)
+        except ValueError as e:
+            print(f"❌ Can't compare against {args.baseline}: {e}")
+            return 2
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    code = main()
+    print(f"Done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    sys.exit(code)
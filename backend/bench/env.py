@@ -0,0 +1,38 @@
+# bench/env.py - Isolated environment for benchmark runs
+import os
+import tempfile
+
+# Matches the defaults used by bench/seed.py and bench/fake_sso.py
+BENCH_JWT_SECRET = "bench-jwt-secret"
+BENCH_CLIENT_ID = "bench-client"
+BENCH_CLIENT_SECRET = "bench-secret"
+
+def configure(workdir: str = None, sso_url: str = "http://127.0.0.1:8765") -> str:
+    """
+    Point the backend at a throwaway work directory and the fake SSO server.
+    Must be called before app, models, storage or oauth_service are imported,
+    since they read their configuration at import time. Returns the workdir.
+    """
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="kameraveiing-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    # Every run seeds from scratch, so a reused workdir must not keep old rows
+    db_path = os.path.join(workdir, "bench.db")
+    archive_db_path = os.path.join(workdir, "archive.db")
+    for path in (db_path, archive_db_path):
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["ARCHIVE_DATABASE_URL"] = f"sqlite:///{archive_db_path}"
+    os.environ["COLD_STORAGE_DIR"] = os.path.join(workdir, "cold")
+    os.environ["COLD_CACHE_DIR"] = os.path.join(workdir, "cold_cache")
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["DUMMY_S3_DIR"] = os.path.join(workdir, "dummy_s3")
+    os.environ["DUMMY_SQL_CSV"] = os.path.join(workdir, "dummy_azure_sql.csv")
+    os.environ["SESSION_FILE_DIR"] = os.path.join(workdir, "flask_session")
+    os.environ["JWT_SECRET"] = BENCH_JWT_SECRET
+    os.environ["SECRET_KEY"] = "bench-secret-key"
+    os.environ["ANIMALIA_CLIENT_ID"] = BENCH_CLIENT_ID
+    os.environ["ANIMALIA_CLIENT_SECRET"] = BENCH_CLIENT_SECRET
+    os.environ["ANIMALIA_SSO_URL"] = sso_url
+    return workdir
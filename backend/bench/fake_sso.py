@@ -0,0 +1,129 @@
+# bench/fake_sso.py - Local stand-in for the Animalia SSO endpoints
+import threading
+import time
+import uuid
+import json
+from typing import Optional, Dict, Any
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask, request, redirect
+from werkzeug.serving import make_server
+
+KEY_ID = "bench-key-1"
+
+class FakeSSO:
+    """
+    Issues RS256 tokens and serves /authorize, /token, /keys, /userinfo and
+    /logout the way AnimaliaOAuthService expects them.
+    Tokens carry `pid` as the farmer ID, like the real id_token.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, token_ttl: int = 3600):
+        self.host = host
+        self.port = port
+        self.token_ttl = token_ttl
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        jwk.update({"kid": KEY_ID, "alg": "RS256", "use": "sig"})
+        self.jwks = {"keys": [jwk]}
+        self.codes: Dict[str, Dict[str, Any]] = {}
+        self.app = self._create_app()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def issue_token(self, farmer_id: str, email: str = None, name: str = None, sub: str = None) -> str:
+        """Create a signed RS256 token for a farmer"""
+        now = int(time.time())
+        claims = {
+            "iss": self.url,
+            "sub": sub or str(uuid.uuid5(uuid.NAMESPACE_URL, farmer_id)),
+            "pid": farmer_id,
+            "email": email or f"{farmer_id.lower()}@bench.local",
+            "name": name or f"Bench Farmer {farmer_id}",
+            "iat": now,
+            "exp": now + self.token_ttl,
+        }
+        return jwt.encode(claims, self.private_key, algorithm="RS256", headers={"kid": KEY_ID})
+
+    def decode_token(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return jwt.decode(token, self.private_key.public_key(), algorithms=["RS256"])
+        except jwt.InvalidTokenError:
+            return None
+
+    def _create_app(self) -> Flask:
+        app = Flask("fake_sso")
+
+        @app.route("/authorize", methods=["GET"])
+        def authorize():
+            # Auto-login: hand out a code for the farmer given by ?pid=, or a default one
+            code = uuid.uuid4().hex
+            self.codes[code] = {"farmer_id": request.args.get("pid", "F0000001")}
+            target = f"{request.args['redirect_uri']}?code={code}"
+            if request.args.get("state"):
+                target += f"&state={request.args['state']}"
+            return redirect(target)
+
+        @app.route("/token", methods=["POST"])
+        def token():
+            code = request.form.get("code")
+            farmer_id = self.codes.pop(code, {}).get("farmer_id") if code else None
+            if not farmer_id:
+                farmer_id = request.form.get("pid", "F0000001")
+            access_token = self.issue_token(farmer_id)
+            # Animalia returns 201 Created on success
+            return {
+                "access_token": access_token,
+                "id_token": access_token,
+                "token_type": "Bearer",
+                "expires_in": self.token_ttl,
+            }, 201
+
+        @app.route("/keys", methods=["GET"])
+        def keys():
+            return self.jwks
+
+        @app.route("/userinfo", methods=["GET"])
+        def userinfo():
+            auth_header = request.headers.get("Authorization", "")
+            claims = self.decode_token(auth_header[7:]) if auth_header.startswith("Bearer ") else None
+            if not claims:
+                return {"error": "invalid_token"}, 401
+            return {
+                "id": claims["sub"],
+                "sub": claims["sub"],
+                "farmer_id": claims["pid"],
+                "pid": claims["pid"],
+                "email": claims["email"],
+                "name": claims["name"],
+            }
+
+        @app.route("/logout", methods=["GET"])
+        def logout():
+            return {"logged_out": True}
+
+        return app
+
+    def start(self) -> "FakeSSO":
+        """Serve in a background thread"""
+        self._server = make_server(self.host, self.port, self.app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._thread.join()
+            self._server = None
+
+if __name__ == "__main__":
+    sso = FakeSSO()
+    print(f"Fake Animalia SSO listening on {sso.url}")
+    print(f"Sample token for F0000001: {sso.issue_token('F0000001')}")
+    sso.app.run(host=sso.host, port=sso.port, threaded=True)
@@ -0,0 +1,44 @@
+# bench/images.py - Deterministic synthetic pig photos
+import io
+import random
+from typing import Iterator, Tuple
+
+from PIL import Image, ImageDraw
+
+FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+def synthetic_image(fmt: str = "jpeg", width: int = 1280, height: int = 960, seed: int = 0) -> bytes:
+    """
+    Render a noisy image with a few blobs so encoders can't cheat with flat colour.
+    Same (fmt, size, seed) always gives the same bytes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    rng = random.Random(seed)
+    # Random pixels are compressed poorly, which keeps file sizes close to real photos
+    img = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    draw = ImageDraw.Draw(img)
+    for _ in range(8):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(20, max(21, min(width, height) // 3))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(rng.randrange(256), rng.randrange(180), rng.randrange(180)))
+
+    buf = io.BytesIO()
+    if fmt == "jpeg":
+        img.save(buf, FORMATS[fmt], quality=85)
+    else:
+        img.save(buf, FORMATS[fmt])
+    return buf.getvalue()
+
+def upload_filename(weight_kg: float, pig_uid: str, picture_number: int, timestamp: str) -> str:
+    """Filename in the format /api/upload parses: weight_uid_picnum_date_timestamp_device.png"""
+    return f"{weight_kg:.2f}kg_{pig_uid}_{picture_number}_{timestamp[:8]}_{timestamp[8:]}_iOS.png"
+
+def image_stream(count: int, fmt: str = "jpeg", width: int = 640, height: int = 480, seed: int = 0) -> Iterator[Tuple[str, bytes, float]]:
+    """Yield (upload filename, image bytes, weight) tuples"""
+    rng = random.Random(seed)
+    for i in range(count):
+        weight = round(rng.uniform(20.0, 130.0), 2)
+        pig_uid = f"uid{rng.randrange(10000):04d}"
+        timestamp = f"20250606{100000000 + i:09d}"
+        yield upload_filename(weight, pig_uid, i + 1, timestamp), synthetic_image(fmt, width, height, seed + i), weight
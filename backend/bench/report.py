@@ -0,0 +1,181 @@
+# bench/report.py - Timing helpers, JSON report and baseline comparison
+import json
+import platform
+import resource
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process so far (high-water mark, in KiB)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def current_rss_kb() -> int:
+    """Resident set size right now (KiB); falls back to the high-water mark off Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return peak_rss_kb()
+
+class RssSampler:
+    """
+    Samples RSS in a background thread while a scenario runs, so each scenario
+    gets its own peak instead of the process-lifetime ru_maxrss.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_kb = self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, current_rss_kb())
+
+    def __enter__(self) -> "RssSampler":
+        self.start_kb = self.peak_kb = current_rss_kb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, current_rss_kb())
+
+    def stats(self) -> dict:
+        return {"peak_rss_kb": self.peak_kb, "rss_growth_kb": self.peak_kb - self.start_kb}
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0, rss: RssSampler = None) -> dict:
+    """Throughput, latency percentiles (ms) and memory for one scenario"""
+    ordered = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "ops": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+            "p50": ms(percentile(ordered, 50)),
+            "p90": ms(percentile(ordered, 90)),
+            "p99": ms(percentile(ordered, 99)),
+            "max": ms(ordered[-1]) if ordered else 0.0,
+        },
+        **(rss.stats() if rss else {"peak_rss_kb": current_rss_kb(), "rss_growth_kb": 0}),
+    }
+
+def measure(fn: Callable[[int], bool], iterations: int, warmup: int = 3) -> dict:
+    """Call fn(i) sequentially; fn returns False to count an error"""
+    for i in range(warmup):
+        fn(i)
+    latencies, errors = [], 0
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            ok = fn(i)
+            latencies.append(time.perf_counter() - t0)
+            if ok is False:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors, rss)
+
+def measure_concurrent(fn: Callable[[int], bool], requests_total: int, concurrency: int) -> dict:
+    """Call fn(i) from `concurrency` threads until requests_total calls are done"""
+    def timed(i):
+        t0 = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        return time.perf_counter() - t0, ok is not False
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, range(requests_total)))
+        elapsed = time.perf_counter() - started
+    summary = summarize([r[0] for r in results], elapsed, sum(1 for r in results if not r[1]), rss)
+    summary["concurrency"] = concurrency
+    return summary
+
+def build_report(results: dict, params: dict) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": results,
+        "process_peak_rss_kb": peak_rss_kb(),
+    }
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+# Parameters that select or label scenarios (or only affect this process), not the
+# workload a scenario measures
+COMPARE_IGNORED_PARAMS = {"only", "skip_load", "seed", "tolerance", "sso_port", "app_port"}
+
+def compare(report: dict, baseline_path: str, tolerance: float = 0.10) -> list[str]:
+    """
+    Compare against a saved report. A scenario regresses when throughput drops,
+    or p99 latency or its peak RSS grows, by more than `tolerance`.
+    Returns regression messages; raises ValueError if the baseline was recorded
+    with a different workload (rows, image size, concurrency, ...).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    base_params = baseline.get("meta", {}).get("params", {})
+    cur_params = report["meta"]["params"]
+    mismatched = sorted(
+        k for k in set(base_params) | set(cur_params)
+        if k not in COMPARE_IGNORED_PARAMS and base_params.get(k) != cur_params.get(k)
+    )
+    if mismatched:
+        raise ValueError("baseline was recorded with different parameters: " + ", ".join(
+            f"{k}={cur_params.get(k)!r} (baseline {base_params.get(k)!r})" for k in mismatched))
+
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        current = report["results"].get(name)
+        if current is None:
+            continue
+        if base["throughput"] and current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput']:.1f}/s vs baseline {base['throughput']:.1f}/s")
+        base_p99, cur_p99 = base["latency_ms"]["p99"], current["latency_ms"]["p99"]
+        if base_p99 and cur_p99 > base_p99 * (1 + tolerance):
+            regressions.append(f"{name}: p99 {cur_p99:.2f}ms vs baseline {base_p99:.2f}ms")
+        base_rss, cur_rss = base.get("peak_rss_kb", 0), current.get("peak_rss_kb", 0)
+        if base_rss and cur_rss > base_rss * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {cur_rss / 1024:.1f}MiB vs baseline {base_rss / 1024:.1f}MiB")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base.get('errors', 0)}")
+    return regressions
+
+def print_table(results: dict, out=None):
+    out = out or sys.stdout
+    print(f"{'scenario':<28}{'ops':>8}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'rss MiB':>10}"
+          f"{'+rss MiB':>10}", file=out)
+    for name, r in results.items():
+        lat = r["latency_ms"]
+        print(f"{name:<28}{r['ops']:>8}{r['throughput']:>12.1f}{lat['p50']:>10.2f}{lat['p99']:>10.2f}"
+              f"{r['errors']:>8}{r['peak_rss_kb'] / 1024:>10.1f}{r['rss_growth_kb'] / 1024:>10.1f}", file=out)
@@ -0,0 +1,87 @@
+# bench/seed.py - Bulk seeder for users and uploads
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+def farmer_ids(n_users: int) -> list[str]:
+    return [f"F{i:07d}" for i in range(1, n_users + 1)]
+
+def seed_users(engine, n_users: int) -> list[dict]:
+    """Create one User per farmer ID. Returns the inserted rows."""
+    from models import User
+
+    rows = [
+        {
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, farmer_id)),
+            "email": f"{farmer_id.lower()}@bench.local",
+            "full_name": f"Bench Farmer {farmer_id}",
+            "is_active": True,
+            "is_admin": False,
+            "farmer_id": farmer_id,
+            "created_at": datetime(2025, 1, 1),
+            "last_login": None,
+        }
+        for farmer_id in farmer_ids(n_users)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(User), rows)
+    return rows
+
+def seed_uploads(engine, n_rows: int, n_users: int = 100, pigs_per_user: int = 50,
+                 batch_size: int = 20000, seed: int = 0, days: int = 365) -> float:
+    """
+    Insert n_rows Upload rows in executemany batches, spread over the last `days` days.
+    Rows are generated lazily so millions of rows never sit in memory at once.
+    Returns rows per second.
+    """
+    from models import Upload
+
+    rng = random.Random(seed)
+    farmers = farmer_ids(n_users)
+    now = datetime.utcnow()
+    picture_numbers: dict[tuple[str, str], int] = {}
+    started = time.perf_counter()
+
+    inserted = 0
+    while inserted < n_rows:
+        batch = []
+        for _ in range(min(batch_size, n_rows - inserted)):
+            farmer_id = rng.choice(farmers)
+            pig_uid = f"{farmer_id}_{rng.randrange(pigs_per_user)}"
+            picture_number = picture_numbers.get((farmer_id, pig_uid), 0) + 1
+            picture_numbers[(farmer_id, pig_uid)] = picture_number
+            weight = round(rng.uniform(20.0, 130.0), 2)
+            batch.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "pig_uid": pig_uid,
+                "user_id": farmer_id,
+                "picture_number": picture_number,
+                "filename": f"{weight:.2f}kg_uid{pig_uid}_{picture_number}_userID{farmer_id}.png",
+                "weight_kg": weight,
+                "created_at": now - timedelta(seconds=rng.randrange(days * 86400)),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Upload), batch)
+        inserted += len(batch)
+
+    elapsed = time.perf_counter() - started
+    return n_rows / elapsed if elapsed else 0.0
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Seed the database configured by DATABASE_URL")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from models import init_db, engine
+
+    init_db()
+    seed_users(engine, args.users)
+    rate = seed_uploads(engine, args.rows, n_users=args.users, seed=args.seed)
+    print(f"Seeded {args.rows} uploads for {args.users} farmers ({rate:,.0f} rows/s)")
@@ -0,0 +1,243 @@
+# migrate_layout.py - Online migration of stored images to another directory layout
+#
+# Moves files under UPLOAD_ROOT and the dummy S3 bucket into the layout given by
+# UPLOAD_LAYOUT (or --layout) while the app keeps serving:
+#   1. uploads table rows are streamed in keyset batches; each file is hard-linked
+#      at its new path, the row's `filename` is updated, then the old link is removed,
+#      so every row points at an existing file at every moment
+#   2. dummy S3 objects are driven by the dummy Azure SQL CSV the same way: each
+#      file is hard-linked at its new path, the CSV is rewritten with the new
+#      `filename` values and swapped in atomically, then the old links are removed
+#   3. remaining top-level files (files without a row) are moved; their old names
+#      keep working through storage.resolve_path
+# Re-running is safe: files already in place are skipped.
+#
+# Switch the app to the new layout (UPLOAD_LAYOUT=...) before migrating, so no new
+# files are written in the old layout while this runs.
+#
+# Hard links keep the original file's mtime, so a freshly linked path looks old.
+# reconcile.py --repair skips files that still have a second link or a recent
+# ctime, but don't run it while a migration is in progress.
+#
+# Usage (from the backend directory):
+#   python migrate_layout.py --layout hash --workers 16
+#   python migrate_layout.py --layout farmer_month --dry-run
+import argparse
+import csv
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import update, bindparam
+
+from models import SessionLocal, Upload, engine, init_db
+from storage import (
+    LAYOUTS, UPLOAD_LAYOUT, UPLOAD_ROOT, DUMMY_S3_ROOT, DUMMY_SQL_CSV, shard_path, ensure_parent, csv_lock
+)
+
+BATCH_SIZE = 1000
+# A path already in the farmer_month layout: <farmer>/<YYYY-MM>/<name>
+_FARMER_MONTH_PATH = re.compile(r"^[^/]+/\d{4}-\d{2}/[^/]+$")
+
+def _link(root: str, old_rel: str, new_rel: str) -> str:
+    """Make the file reachable at new_rel. Returns 'linked', 'present' or 'missing'."""
+    old_abs = os.path.join(root, *old_rel.split("/"))
+    new_abs = ensure_parent(root, new_rel)
+    if os.path.exists(new_abs):
+        return "present"
+    try:
+        os.link(old_abs, new_abs)
+    except FileNotFoundError:
+        return "missing"
+    except OSError:
+        # No hard links on this filesystem: copy-free rename instead
+        try:
+            os.replace(old_abs, new_abs)
+        except FileNotFoundError:
+            return "missing"
+    return "linked"
+
+def _unlink(root: str, rel: str):
+    try:
+        os.remove(os.path.join(root, *rel.split("/")))
+    except FileNotFoundError:
+        pass
+
+def migrate_uploads(layout: str, workers: int, dry_run: bool = False) -> dict:
+    """Move files referenced by the uploads table and rewrite their `filename`"""
+    root = os.path.abspath(UPLOAD_ROOT)
+    stats = {"rows": 0, "moved": 0, "missing": 0}
+    table = Upload.__table__
+    stmt = update(table).where(table.c.id == bindparam("row_id")).values(filename=bindparam("new_filename"))
+    last_id = ""
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                rows = db.query(Upload.id, Upload.filename, Upload.user_id, Upload.created_at).filter(
+                    Upload.id > last_id
+                ).order_by(Upload.id).limit(BATCH_SIZE).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                stats["rows"] += len(rows)
+
+                moves = []
+                for r in rows:
+                    target = shard_path(r.filename, r.user_id, r.created_at, layout)
+                    if target != r.filename:
+                        moves.append((r.id, r.filename, target))
+                if dry_run or not moves:
+                    stats["moved"] += len(moves)
+                    continue
+
+                results = list(pool.map(lambda m: _link(root, m[1], m[2]), moves))
+                done = [m for m, res in zip(moves, results) if res != "missing"]
+                stats["missing"] += len(moves) - len(done)
+                if done:
+                    with engine.begin() as conn:
+                        conn.execute(stmt, [{"row_id": row_id, "new_filename": new} for row_id, _, new in done])
+                    list(pool.map(lambda m: _unlink(root, m[1]), done))
+                stats["moved"] += len(done)
+    finally:
+        db.close()
+    return stats
+
+def _csv_row_month(row: list, abs_path: str) -> datetime:
+    """Month for farmer_month: the CSV date column, else the file's mtime"""
+    try:
+        return datetime.strptime(row[2], "%Y%m%d")
+    except (IndexError, ValueError):
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(abs_path))
+        except OSError:
+            return datetime.utcnow()
+
+def _csv_row_target(row: list, old: str, root: str, layout: str) -> str:
+    """
+    New path of a CSV object. create_upload files objects of logged-in users under
+    their farmer ID; the CSV doesn't record it, so an existing farmer_month prefix
+    is kept as is. Everything else has no farmer and goes to unknown/.
+    """
+    if layout == "farmer_month" and _FARMER_MONTH_PATH.match(old):
+        return old
+    return shard_path(old, when=_csv_row_month(row, os.path.join(root, *old.split("/"))), layout=layout)
+
+def migrate_csv_objects(csv_path: str, layout: str, workers: int, dry_run: bool = False) -> dict:
+    """Move dummy S3 objects referenced by the CSV and rewrite its `filename` column"""
+    root = os.path.abspath(DUMMY_S3_ROOT)
+    stats = {"rows": 0, "moved": 0, "missing": 0}
+    if not os.path.isfile(csv_path):
+        return stats
+
+    csv_dir = os.path.dirname(os.path.abspath(csv_path))
+    tmp = tempfile.NamedTemporaryFile("w", newline="", dir=csv_dir, suffix=".migrate.tmp", delete=False)
+    # Old names to drop once the new CSV is in place; kept on disk, not in memory
+    stale = tempfile.TemporaryFile("w+", dir=csv_dir)
+    try:
+        with open(csv_path, "r", newline="") as src, tmp, ThreadPoolExecutor(max_workers=workers) as pool:
+            writer = csv.writer(tmp)
+
+            def flush(batch):
+                moves = [(i, row[0], target) for i, (row, target) in enumerate(batch) if target]
+                results = ["dry-run"] * len(moves) if dry_run else list(pool.map(lambda m: _link(root, m[1], m[2]), moves))
+                for (i, old, target), res in zip(moves, results):
+                    if res == "missing":
+                        stats["missing"] += 1
+                        continue
+                    stats["moved"] += 1
+                    batch[i][0][0] = target
+                    stale.write(old + "\n")
+                writer.writerows(row for row, _ in batch)
+
+            # Only copy what exists now; later appends are carried over verbatim below
+            size_before = os.path.getsize(csv_path)
+            batch = []
+            while src.tell() < size_before:
+                line = src.readline()
+                if not line:
+                    break
+                row = next(csv.reader([line]), [])
+                target = None
+                if row and row[0] != "filename":
+                    stats["rows"] += 1
+                    old = row[0].replace(os.sep, "/").lstrip("/")
+                    new = _csv_row_target(row, old, root, layout)
+                    target = new if new != old else None
+                batch.append((row, target))
+                if len(batch) >= BATCH_SIZE:
+                    flush(batch)
+                    batch = []
+            flush(batch)
+            size_copied = src.tell()
+
+        if dry_run:
+            os.remove(tmp.name)
+            return stats
+
+        # Rows create_upload appended while we were copying are already in the new layout.
+        # Holding its lock, no row can land in the old file after the copy.
+        with csv_lock(csv_path):
+            with open(csv_path, "rb") as src, open(tmp.name, "ab") as dst:
+                src.seek(size_copied)
+                dst.write(src.read())
+            os.replace(tmp.name, csv_path)
+
+        stale.seek(0)
+        for line in stale:
+            _unlink(root, line.rstrip("\n"))
+    finally:
+        stale.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+    return stats
+
+def migrate_loose_files(root: str, layout: str, workers: int, dry_run: bool = False) -> dict:
+    """Move top-level files of a flat directory into the layout"""
+    stats = {"moved": 0}
+    if not os.path.isdir(root):
+        return stats
+
+    def move(entry_path):
+        name = os.path.basename(entry_path)
+        mtime = datetime.utcfromtimestamp(os.path.getmtime(entry_path))
+        target = shard_path(name, when=mtime, layout=layout)
+        if target == name:
+            return False
+        if not dry_run:
+            os.replace(entry_path, ensure_parent(root, target))
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    batch.append(entry.path)
+                if len(batch) >= BATCH_SIZE:
+                    stats["moved"] += sum(pool.map(move, batch))
+                    batch = []
+        stats["moved"] += sum(pool.map(move, batch))
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate stored images to another directory layout")
+    parser.add_argument("--layout", default=UPLOAD_LAYOUT, choices=LAYOUTS)
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    uploads = migrate_uploads(args.layout, args.workers, args.dry_run)
+    print(f"📦 uploads table: {uploads['rows']} rows, {uploads['moved']} moved, {uploads['missing']} missing files")
+    objects = migrate_csv_objects(DUMMY_SQL_CSV, args.layout, args.workers, args.dry_run)
+    print(f"📦 {DUMMY_SQL_CSV}: {objects['rows']} rows, {objects['moved']} moved, {objects['missing']} missing files")
+    loose = migrate_loose_files(os.path.abspath(UPLOAD_ROOT), args.layout, args.workers, args.dry_run)
+    print(f"📦 {UPLOAD_ROOT}: {loose['moved']} unreferenced files moved")
+    s3 = migrate_loose_files(os.path.abspath(DUMMY_S3_ROOT), args.layout, args.workers, args.dry_run)
+    print(f"📦 {DUMMY_S3_ROOT}: {s3['moved']} unreferenced files moved")
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s{' (dry run)' if args.dry_run else ''}")
@@ -7,6 +7,8 @@ import os
 
 # Database configuration
 DB_URL = os.getenv('DATABASE_URL', 'sqlite:///./data/app.db')
+# Cold tier for old uploads (see archive.py); kept out of the hot database and its backups
+ARCHIVE_DB_URL = os.getenv('ARCHIVE_DATABASE_URL', 'sqlite:///./data/archive.db')
 
 class Base(DeclarativeBase): pass
 
@@ -25,14 +27,36 @@ class Upload(Base):
     __tablename__ = "uploads"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)  # UUID
     pig_uid: Mapped[str] = mapped_column(String(20))               # Pig unique identifier
-    user_id: Mapped[str] = mapped_column(String(20))              # Farmer/User ID (now references User.farmer_id)
+    user_id: Mapped[str] = mapped_column(String(20), index=True)  # Farmer/User ID (now references User.farmer_id)
     picture_number: Mapped[int] = mapped_column()                 # Picture number for this pig
-    filename: Mapped[str] = mapped_column(String(512))             # relative path under uploads/
+    filename: Mapped[str] = mapped_column(String(512), index=True) # relative path under uploads/
     weight_kg: Mapped[float] = mapped_column(Float)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+class ArchiveBase(DeclarativeBase): pass
+
+class ArchivedUpload(ArchiveBase):
+    __tablename__ = "uploads_archive"
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)  # Same UUID as the original Upload
+    pig_uid: Mapped[str] = mapped_column(String(20))
+    user_id: Mapped[str] = mapped_column(String(20), index=True)
+    picture_number: Mapped[int] = mapped_column()
+    filename: Mapped[str] = mapped_column(String(512), index=True) # original path under uploads/
+    weight_kg: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    cold_key: Mapped[str] = mapped_column(String(512), nullable=True)  # pack object in COLD_STORAGE_DIR, None if the file was gone
 
 engine = create_engine(DB_URL, echo=False, future=True)
 SessionLocal = sessionmaker(engine, expire_on_commit=False)
+archive_engine = create_engine(ARCHIVE_DB_URL, echo=False, future=True)
+ArchiveSessionLocal = sessionmaker(archive_engine, expire_on_commit=False)
 
 def init_db():
-    Base.metadata.create_all(engine)
\ No newline at end of file
+    Base.metadata.create_all(engine)
+    # create_all skips indexes added to tables that already exist
+    for index in Upload.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    ArchiveBase.metadata.create_all(archive_engine)
+    for index in ArchivedUpload.__table__.indexes:
+        index.create(archive_engine, checkfirst=True)
\ No newline at end of file
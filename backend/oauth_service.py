@@ -14,16 +14,18 @@ class AnimaliaOAuthService:
         
         # Use correct Animalia SSO endpoints
         self.environment = os.getenv('ANIMALIA_ENVIRONMENT', 'staging')  # 'staging' or 'production'
-        if self.environment == 'production':
-            self.auth_url = 'https://sso.animalia.no/authorize'
-            self.token_url = 'https://sso.animalia.no/token'
-            self.keys_url = 'https://sso.animalia.no/keys'
-            self.logout_url = 'https://sso.animalia.no/logout'
+        # ANIMALIA_SSO_URL overrides the base URL (e.g. a local stand-in for benchmarks)
+        if os.getenv('ANIMALIA_SSO_URL'):
+            self.base_url = os.getenv('ANIMALIA_SSO_URL').rstrip('/')
+        elif self.environment == 'production':
+            self.base_url = 'https://sso.animalia.no'
         else:
-            self.auth_url = 'https://staging-sso.animalia.no/authorize'
-            self.token_url = 'https://staging-sso.animalia.no/token'
-            self.keys_url = 'https://staging-sso.animalia.no/keys'
-            self.logout_url = 'https://staging-sso.animalia.no/logout'
+            self.base_url = 'https://staging-sso.animalia.no'
+        self.auth_url = f'{self.base_url}/authorize'
+        self.token_url = f'{self.base_url}/token'
+        self.keys_url = f'{self.base_url}/keys'
+        self.userinfo_url = f'{self.base_url}/userinfo'
+        self.logout_url = f'{self.base_url}/logout'
             
         self.redirect_uri = os.getenv('ANIMALIA_REDIRECT_URI', 'http://172.17.250.146:8000/api/auth/oauth/callback')
         print(f"🔧 OAuth Service initialized with redirect_uri: {self.redirect_uri}")
@@ -121,15 +123,9 @@ class AnimaliaOAuthService:
     
     def get_user_info_from_token(self, access_token: str) -> Optional[Dict[str, Any]]:
         """Fetch user information from Animalia SSO /userinfo endpoint using the access token"""
-        # Use the correct userinfo endpoint for staging/production
-        if self.environment == 'production':
-            userinfo_url = 'https://sso.animalia.no/userinfo'
-        else:
-            userinfo_url = 'https://staging-sso.animalia.no/userinfo'
-
         headers = {"Authorization": f"Bearer {access_token}"}
         try:
-            response = requests.get(userinfo_url, headers=headers)
+            response = requests.get(self.userinfo_url, headers=headers)
             print(f"🔍 Userinfo endpoint response status: {response.status_code}")
             print(f"🔍 Userinfo endpoint response body: {response.text}")
             if response.status_code == 200:
@@ -0,0 +1,629 @@
+# reconcile.py - Storage/metadata reconciliation and integrity scrubber
+#
+# Upload metadata lives in three places that are never written transactionally:
+#   * the `uploads` table          <-> files under UPLOAD_ROOT
+#   * dummy_azure_sql.csv (DUMMY_SQL_CSV) <-> files under dummy_s3 (DUMMY_S3_ROOT)
+# This walks both storage roots with os.scandir on a thread pool, streams DB rows in
+# keyset batches and the CSV line by line, and records orphans, missing blobs,
+# duplicate/malformed CSV rows and damaged files.
+#
+# All state lives in a small SQLite checkpoint (RECONCILE_STATE_PATH), not in memory:
+#   * an interrupted run resumes where it stopped
+#   * files whose size and mtime are unchanged are not re-hashed on the next run
+#
+# Usage (from the backend directory):
+#   python reconcile.py                  # scan and report
+#   python reconcile.py --verify         # re-hash every file to catch silent corruption
+#   python reconcile.py --repair         # quarantine orphans, drop dangling rows
+#   python reconcile.py --fresh          # discard an unfinished run and start over
+import argparse
+import csv
+import hashlib
+import imghdr
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import SessionLocal, Upload, init_db
+from storage import UPLOAD_ROOT, DUMMY_S3_ROOT, DUMMY_SQL_CSV, resolve_path, csv_lock
+
+STATE_PATH = os.environ.get("RECONCILE_STATE_PATH", "data/reconcile_state.db")
+QUARANTINE_ROOT = os.environ.get("RECONCILE_QUARANTINE_DIR", "data/quarantine")
+
+CSV_HEADER = ["filename", "weight", "date", "timestamp", "uploader"]
+IMAGE_TYPES = {"jpeg", "png", "webp"}
+PHASES = ["scan", "hash", "uploads", "csv", "integrity", "done"]
+
+SCAN_CHUNK = 5000      # files per message from a scan worker
+BATCH_SIZE = 5000      # DB rows / CSV lines per checkpoint
+HASH_BATCH = 1000      # files hashed per checkpoint
+SQL_VARS = 900         # stay under SQLite's bound-parameter limit
+EXAMPLES_PER_KIND = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    image_type TEXT,
+    seen_run INTEGER NOT NULL DEFAULT 0,
+    verified_run INTEGER NOT NULL DEFAULT 0,
+    referenced_run INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (root, path)
+);
+CREATE INDEX IF NOT EXISTS ix_files_seen ON files (seen_run);
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (root, path)
+);
+CREATE TABLE IF NOT EXISTS csv_seen (filename TEXT PRIMARY KEY, line INTEGER);
+CREATE TABLE IF NOT EXISTS issues (
+    run INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    root TEXT,
+    path TEXT,
+    ref TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_issues_run_kind ON issues (run, kind);
+"""
+
+class Checkpoint:
+    """Resumable on-disk state for reconciliation runs"""
+
+    def __init__(self, path: str = STATE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def add(self, key: str, amount: int):
+        self.set(key, int(self.get(key, 0)) + amount)
+
+    def issue(self, run: int, kind: str, root: str = None, path: str = None, ref=None, detail=None):
+        self.conn.execute(
+            "INSERT INTO issues (run, kind, root, path, ref, detail) VALUES (?, ?, ?, ?, ?, ?)",
+            (run, kind, root, path, None if ref is None else str(ref), None if detail is None else str(detail)),
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def _chunks(items: list, size: int = SQL_VARS):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _normalize(path: str) -> str:
+    """DB/CSV filenames -> path relative to the storage root with '/' separators"""
+    return path.replace(os.sep, "/").lstrip("/")
+
+# ============================================================================
+# RUN MANAGEMENT
+# ============================================================================
+
+def start_run(cp: Checkpoint, fresh: bool = False) -> int:
+    """Resume the unfinished run, or start a new one"""
+    run = int(cp.get("run", 0))
+    if run and cp.get("phase") != "done" and not fresh:
+        print(f"↩️  Resuming run {run} at phase '{cp.get('phase')}'")
+        return run
+
+    run += 1
+    cp.conn.execute("DELETE FROM dirs")
+    cp.conn.execute("DELETE FROM csv_seen")
+    cp.conn.execute("DELETE FROM issues WHERE run < ?", (run - 1,))
+    cp.conn.execute("DELETE FROM issues WHERE run = ?", (run,))
+    cp.set("run", run)
+    cp.set("phase", "scan")
+    cp.set("started_at", datetime.utcnow().isoformat())
+    cp.set("db_last_id", "")
+    cp.set("csv_offset", 0)
+    cp.set("csv_line", 0)
+    for counter in ("files_hashed", "upload_rows", "csv_rows"):
+        cp.set(counter, 0)
+    cp.commit()
+    return run
+
+def _advance(cp: Checkpoint, phase: str):
+    cp.set("phase", PHASES[PHASES.index(phase) + 1])
+    cp.commit()
+
+# ============================================================================
+# PHASE 1: PARALLEL STORAGE WALK
+# ============================================================================
+
+def _scan_dir(root_name: str, root: str, rel: str, out: queue.Queue):
+    """Worker: list one directory, streaming file stats back in chunks"""
+    files, subdirs = [], []
+    try:
+        with os.scandir(os.path.join(root, rel)) as it:
+            for entry in it:
+                path = f"{rel}/{entry.name}" if rel else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(path)
+                elif entry.is_file(follow_symlinks=False):
+                    # Deleted since the listing (live store): skip it, keep scanning the rest
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    files.append((root_name, path, st.st_size, st.st_mtime_ns))
+                    if len(files) >= SCAN_CHUNK:
+                        out.put(("files", files))
+                        files = []
+    except OSError as e:
+        out.put(("error", (root_name, rel, str(e))))
+    out.put(("files", files))
+    out.put(("dir", (root_name, rel, subdirs)))
+
+def scan_storage(cp: Checkpoint, run: int, roots: dict, workers: int) -> int:
+    """Walk every root; files with unchanged size/mtime keep their stored checksum"""
+    for root_name, root in roots.items():
+        if os.path.isdir(root):
+            cp.conn.execute("INSERT OR IGNORE INTO dirs (root, path) VALUES (?, '')", (root_name,))
+    cp.commit()
+
+    upsert = """
+        INSERT INTO files (root, path, size, mtime_ns, seen_run) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (root, path) DO UPDATE SET
+            sha256 = CASE WHEN files.size = excluded.size AND files.mtime_ns = excluded.mtime_ns
+                          THEN files.sha256 ELSE NULL END,
+            image_type = CASE WHEN files.size = excluded.size AND files.mtime_ns = excluded.mtime_ns
+                              THEN files.image_type ELSE NULL END,
+            size = excluded.size,
+            mtime_ns = excluded.mtime_ns,
+            seen_run = excluded.seen_run
+    """
+    # Bounded queue: workers block instead of piling up millions of entries in memory
+    out = queue.Queue(maxsize=workers * 4)
+    scanned, outstanding, since_commit = 0, 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for root_name, rel in cp.conn.execute("SELECT root, path FROM dirs WHERE done = 0").fetchall():
+            pool.submit(_scan_dir, root_name, roots[root_name], rel, out)
+            outstanding += 1
+
+        while outstanding:
+            kind, payload = out.get()
+            if kind == "files":
+                cp.conn.executemany(upsert, [(*f, run) for f in payload])
+                scanned += len(payload)
+                since_commit += len(payload)
+                if since_commit >= BATCH_SIZE * 10:
+                    cp.commit()
+                    since_commit = 0
+            elif kind == "error":
+                root_name, rel, error = payload
+                cp.issue(run, "scan_error", root_name, rel, detail=error)
+            else:
+                root_name, rel, subdirs = payload
+                cp.conn.executemany("INSERT OR IGNORE INTO dirs (root, path) VALUES (?, ?)",
+                                    [(root_name, d) for d in subdirs])
+                cp.conn.execute("UPDATE dirs SET done = 1 WHERE root = ? AND path = ?", (root_name, rel))
+                cp.commit()
+                since_commit = 0
+                for d in subdirs:
+                    pool.submit(_scan_dir, root_name, roots[root_name], d, out)
+                outstanding += len(subdirs) - 1
+
+    # Files that disappeared since the previous run are no longer tracked
+    cp.conn.execute("DELETE FROM files WHERE seen_run != ?", (run,))
+    return scanned
+
+# ============================================================================
+# PHASE 2: CHECKSUMS
+# ============================================================================
+
+def _hash_file(abs_path: str):
+    """Return (sha256, image_type, bytes_read) or raise OSError"""
+    h = hashlib.sha256()
+    nbytes = 0
+    with open(abs_path, "rb") as f:
+        chunk = f.read(1 << 20)
+        image_type = imghdr.what(None, h=chunk)
+        while chunk:
+            h.update(chunk)
+            nbytes += len(chunk)
+            chunk = f.read(1 << 20)
+    return h.hexdigest(), image_type, nbytes
+
+def hash_files(cp: Checkpoint, run: int, roots: dict, workers: int, verify: bool = False) -> int:
+    """
+    Hash new and changed files (or, with verify, every file) in parallel.
+    With verify, a checksum that changed while size and mtime did not is reported
+    as silent corruption.
+    """
+    condition = "verified_run != ?" if verify else "sha256 IS NULL AND verified_run != ?"
+    hashed, last_rowid = 0, 0
+
+    def work(row):
+        rowid, root_name, path, size, old_sha = row
+        try:
+            return row, _hash_file(os.path.join(roots[root_name], path)), None
+        except OSError as e:
+            return row, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = cp.conn.execute(
+                f"SELECT rowid, root, path, size, sha256 FROM files "
+                f"WHERE rowid > ? AND seen_run = ? AND {condition} ORDER BY rowid LIMIT ?",
+                (last_rowid, run, run, HASH_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            for (rowid, root_name, path, size, old_sha), result, error in pool.map(work, rows):
+                if error:
+                    cp.issue(run, "unreadable", root_name, path, detail=error)
+                    cp.conn.execute("UPDATE files SET verified_run = ? WHERE rowid = ?", (run, rowid))
+                    continue
+                sha, image_type, nbytes = result
+                if nbytes != size:
+                    cp.issue(run, "size_changed", root_name, path, detail=f"scanned {size} bytes, read {nbytes}")
+                elif old_sha and old_sha != sha:
+                    cp.issue(run, "checksum_mismatch", root_name, path, detail=f"{old_sha} -> {sha}")
+                cp.conn.execute(
+                    "UPDATE files SET sha256 = ?, image_type = ?, size = ?, verified_run = ? WHERE rowid = ?",
+                    (sha, image_type, nbytes, run, rowid),
+                )
+            hashed += len(rows)
+            last_rowid = rows[-1][0]
+            cp.add("files_hashed", len(rows))
+            cp.commit()
+    return hashed
+
+# ============================================================================
+# PHASE 3/4: METADATA SOURCES
+# ============================================================================
+
+def _mark_referenced(cp: Checkpoint, run: int, root_name: str, paths: list) -> set:
+    """Flag files as referenced by metadata; returns the subset that exists on disk"""
+    found = set()
+    unique = list(set(paths))
+    for chunk in _chunks(unique):
+        marks = ",".join("?" * len(chunk))
+        found.update(r[0] for r in cp.conn.execute(
+            f"SELECT path FROM files WHERE root = ? AND seen_run = ? AND path IN ({marks})",
+            (root_name, run, *chunk),
+        ))
+        cp.conn.execute(
+            f"UPDATE files SET referenced_run = ? WHERE root = ? AND path IN ({marks})",
+            (run, root_name, *chunk),
+        )
+    return found
+
+def _mark_resolved(cp: Checkpoint, run: int, root_name: str, root: str, paths: list) -> set:
+    """Of paths not found as recorded, those still reachable under another layout"""
+    moved = {}
+    for path in set(paths):
+        alt = resolve_path(root, path)
+        if alt:
+            moved[path] = alt
+    _mark_referenced(cp, run, root_name, list(moved.values()))
+    return set(moved)
+
+def check_uploads(cp: Checkpoint, run: int, root: str):
+    """Stream the uploads table by primary key and match rows against UPLOAD_ROOT"""
+    last_id = cp.get("db_last_id", "")
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Upload.id, Upload.filename).filter(
+                Upload.id > last_id
+            ).order_by(Upload.id).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+            paths = [_normalize(r.filename) for r in rows]
+            found = _mark_referenced(cp, run, "uploads", paths)
+            found |= _mark_resolved(cp, run, "uploads", root, [p for p in paths if p not in found])
+            for r in rows:
+                if _normalize(r.filename) not in found:
+                    cp.issue(run, "missing_blob", "uploads", _normalize(r.filename), ref=r.id)
+            last_id = rows[-1].id
+            cp.set("db_last_id", last_id)
+            cp.add("upload_rows", len(rows))
+            cp.commit()
+    finally:
+        db.close()
+
+def _check_csv_batch(cp: Checkpoint, run: int, batch: list, root: str):
+    referenced = []
+    for line_no, row in batch:
+        if len(row) != len(CSV_HEADER):
+            cp.issue(run, "csv_malformed", "s3", row[0] if row else None, ref=line_no,
+                     detail=f"expected {len(CSV_HEADER)} columns, got {len(row)}")
+            continue
+        filename = _normalize(row[0])
+        try:
+            float(row[1])
+        except ValueError:
+            cp.issue(run, "csv_malformed", "s3", filename, ref=line_no, detail=f"bad weight {row[1]!r}")
+        cur = cp.conn.execute("INSERT OR IGNORE INTO csv_seen (filename, line) VALUES (?, ?)", (filename, line_no))
+        if cur.rowcount == 0:
+            first = cp.conn.execute("SELECT line FROM csv_seen WHERE filename = ?", (filename,)).fetchone()[0]
+            cp.issue(run, "csv_duplicate", "s3", filename, ref=line_no, detail=f"first seen on line {first}")
+            continue
+        referenced.append((line_no, filename))
+
+    found = _mark_referenced(cp, run, "s3", [f for _, f in referenced])
+    found |= _mark_resolved(cp, run, "s3", root, [f for _, f in referenced if f not in found])
+    for line_no, filename in referenced:
+        if filename not in found:
+            cp.issue(run, "csv_missing_blob", "s3", filename, ref=line_no)
+
+def check_csv(cp: Checkpoint, run: int, csv_path: str, root: str):
+    """Stream the dummy Azure SQL CSV and match rows against the dummy S3 bucket"""
+    if not os.path.isfile(csv_path):
+        return
+    offset, line_no = int(cp.get("csv_offset", 0)), int(cp.get("csv_line", 0))
+    with open(csv_path, "r", newline="") as f:
+        f.seek(offset)
+        batch = []
+        while True:
+            line = f.readline()
+            if line:
+                line_no += 1
+                row = next(csv.reader([line]), [])
+                # create_upload re-writes the header when the first line doesn't match it
+                if row and row != CSV_HEADER:
+                    batch.append((line_no, row))
+            if batch and (len(batch) >= BATCH_SIZE or not line):
+                _check_csv_batch(cp, run, batch, root)
+                cp.add("csv_rows", len(batch))
+                batch = []
+            if len(batch) == 0:
+                cp.set("csv_offset", f.tell())
+                cp.set("csv_line", line_no)
+                cp.commit()
+            if not line:
+                break
+
+# ============================================================================
+# PHASE 5: INTEGRITY AND ORPHANS
+# ============================================================================
+
+def check_integrity(cp: Checkpoint, run: int, roots_with_metadata: list):
+    """Derive per-file issues from the checkpoint (so unchanged files are re-reported).
+    Committed together with the phase change, so a resumed run can't double-insert."""
+    cp.conn.execute(
+        "INSERT INTO issues (run, kind, root, path, detail) "
+        "SELECT ?, 'empty_file', root, path, NULL FROM files WHERE seen_run = ? AND size = 0",
+        (run, run),
+    )
+    cp.conn.execute(
+        "INSERT INTO issues (run, kind, root, path, detail) "
+        "SELECT ?, 'not_an_image', root, path, image_type FROM files "
+        "WHERE seen_run = ? AND size > 0 AND sha256 IS NOT NULL "
+        f"AND (image_type IS NULL OR image_type NOT IN ({','.join('?' * len(IMAGE_TYPES))}))",
+        (run, run, *sorted(IMAGE_TYPES)),
+    )
+    for root_name in roots_with_metadata:
+        cp.conn.execute(
+            "INSERT INTO issues (run, kind, root, path, detail) "
+            "SELECT ?, 'orphan_file', root, path, mtime_ns FROM files "
+            "WHERE root = ? AND seen_run = ? AND referenced_run != ?",
+            (run, root_name, run, run),
+        )
+
+# ============================================================================
+# REPAIR
+# ============================================================================
+
+def _iter_issues(cp: Checkpoint, run: int, kind: str):
+    last = 0
+    while True:
+        rows = cp.conn.execute(
+            "SELECT rowid, root, path, ref, detail FROM issues WHERE run = ? AND kind = ? AND rowid > ? "
+            "ORDER BY rowid LIMIT ?",
+            (run, kind, last, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+def quarantine_orphans(cp: Checkpoint, run: int, roots: dict, quarantine_root: str, grace_seconds: int) -> int:
+    """
+    Move orphan files out of the storage roots (never delete them).
+    Files younger than grace_seconds (by mtime or ctime) and files with more than
+    one hard link are left alone: their metadata row may simply not have been
+    written yet, e.g. mid-way through a layout migration.
+    """
+    cutoff_ns = int((time.time() - grace_seconds) * 1e9)
+    moved = 0
+    for rows in _iter_issues(cp, run, "orphan_file"):
+        for _, root_name, path, _, mtime_ns in rows:
+            if int(mtime_ns) > cutoff_ns:
+                continue
+            src = os.path.join(roots[root_name], path)
+            # migrate_layout.py hard-links files before updating their row: a link keeps
+            # the old mtime, but bumps ctime and leaves a second name behind
+            try:
+                st = os.stat(src)
+            except FileNotFoundError:
+                continue
+            if st.st_nlink > 1 or st.st_ctime_ns > cutoff_ns:
+                continue
+            dst = os.path.join(quarantine_root, root_name, path)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            try:
+                shutil.move(src, dst)
+            except FileNotFoundError:
+                pass
+            cp.conn.execute("DELETE FROM files WHERE root = ? AND path = ?", (root_name, path))
+            moved += 1
+        cp.commit()
+    return moved
+
+def drop_dangling_uploads(cp: Checkpoint, run: int, roots: dict) -> int:
+    """Delete upload rows whose file is (still) missing"""
+    removed = 0
+    db = SessionLocal()
+    try:
+        for rows in _iter_issues(cp, run, "missing_blob"):
+            ids = [ref for _, root_name, path, ref, _ in rows
+                   if not resolve_path(roots[root_name], path)]
+            for chunk in _chunks(ids):
+                removed += db.query(Upload).filter(Upload.id.in_(chunk)).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.close()
+    return removed
+
+def rewrite_csv(cp: Checkpoint, run: int, csv_path: str, s3_root: str) -> int:
+    """Stream the CSV into a new file without duplicate rows and rows whose blob is gone"""
+    if not os.path.isfile(csv_path):
+        return 0
+    bad = cp.conn.execute(
+        "SELECT CAST(ref AS INTEGER) AS line, kind, path FROM issues "
+        "WHERE run = ? AND kind IN ('csv_duplicate', 'csv_missing_blob') ORDER BY line",
+        (run,),
+    )
+    next_bad = bad.fetchone()
+    size_before = os.path.getsize(csv_path)
+    tmp_path = f"{csv_path}.reconcile.tmp"
+    dropped = 0
+    with open(csv_path, "r", newline="") as src, open(tmp_path, "w", newline="") as dst:
+        for line_no, line in enumerate(src, start=1):
+            while next_bad and next_bad[0] < line_no:
+                next_bad = bad.fetchone()
+            if next_bad and next_bad[0] == line_no:
+                _, kind, path = next_bad
+                # A blob that reappeared since the scan keeps its row
+                if kind == "csv_duplicate" or not resolve_path(s3_root, path):
+                    dropped += 1
+                    continue
+            dst.write(line)
+
+    # Someone appended while we were copying: keep their rows, try again next run.
+    # create_upload appends under the same lock, so nothing lands between check and swap.
+    with csv_lock(csv_path):
+        if os.path.getsize(csv_path) != size_before:
+            os.remove(tmp_path)
+            print("⚠️  CSV changed during repair, leaving it untouched")
+            return 0
+        os.replace(tmp_path, csv_path)
+    return dropped
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def build_report(cp: Checkpoint, run: int, roots: dict, repaired: dict, elapsed: float) -> dict:
+    counts = dict(cp.conn.execute(
+        "SELECT kind, COUNT(*) FROM issues WHERE run = ? GROUP BY kind ORDER BY kind", (run,)
+    ).fetchall())
+    examples = {}
+    for kind in counts:
+        examples[kind] = [
+            {"root": root, "path": path, "ref": ref, "detail": detail}
+            for root, path, ref, detail in cp.conn.execute(
+                "SELECT root, path, ref, detail FROM issues WHERE run = ? AND kind = ? LIMIT ?",
+                (run, kind, EXAMPLES_PER_KIND),
+            )
+        ]
+    files, total_bytes = cp.conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files WHERE seen_run = ?", (run,)
+    ).fetchone()
+    return {
+        "run": run,
+        "started_at": cp.get("started_at"),
+        "finished_at": datetime.utcnow().isoformat(),
+        "seconds": round(elapsed, 2),
+        "roots": roots,
+        "files_scanned": files,
+        "bytes_scanned": total_bytes,
+        "files_hashed": int(cp.get("files_hashed", 0)),
+        "upload_rows": int(cp.get("upload_rows", 0)),
+        "csv_rows": int(cp.get("csv_rows", 0)),
+        "issues": counts,
+        "examples": examples,
+        "repaired": repaired,
+    }
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def reconcile(state_path: str = STATE_PATH, workers: int = None, verify: bool = False, repair: bool = False,
+              fresh: bool = False, quarantine_root: str = QUARANTINE_ROOT, grace_seconds: int = 3600) -> dict:
+    """Run (or resume) a reconciliation pass and return the report"""
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    roots = {"uploads": os.path.abspath(UPLOAD_ROOT), "s3": os.path.abspath(DUMMY_S3_ROOT)}
+    started = time.perf_counter()
+
+    # A fresh DATABASE_URL has no tables yet; create them before any scanning work
+    init_db()
+    cp = Checkpoint(state_path)
+    try:
+        run = start_run(cp, fresh)
+        if cp.get("phase") == "scan":
+            scanned = scan_storage(cp, run, roots, workers)
+            print(f"📂 Scanned {scanned} files")
+            _advance(cp, "scan")
+        if cp.get("phase") == "hash":
+            hashed = hash_files(cp, run, roots, workers, verify)
+            print(f"🔐 Hashed {hashed} new or changed files")
+            _advance(cp, "hash")
+        if cp.get("phase") == "uploads":
+            check_uploads(cp, run, roots["uploads"])
+            _advance(cp, "uploads")
+        if cp.get("phase") == "csv":
+            check_csv(cp, run, DUMMY_SQL_CSV, roots["s3"])
+            _advance(cp, "csv")
+        if cp.get("phase") == "integrity":
+            check_integrity(cp, run, ["uploads", "s3"])
+            _advance(cp, "integrity")
+
+        repaired = {}
+        if repair:
+            repaired["quarantined_files"] = quarantine_orphans(cp, run, roots, quarantine_root, grace_seconds)
+            repaired["deleted_upload_rows"] = drop_dangling_uploads(cp, run, roots)
+            repaired["dropped_csv_rows"] = rewrite_csv(cp, run, DUMMY_SQL_CSV, roots["s3"])
+
+        return build_report(cp, run, roots, repaired, time.perf_counter() - started)
+    finally:
+        cp.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile uploads table, CSV and stored images")
+    parser.add_argument("--state", default=STATE_PATH, help="Checkpoint database path")
+    parser.add_argument("--workers", type=int, help="Scan/hash threads (default: 4 x CPUs, max 32)")
+    parser.add_argument("--verify", action="store_true", help="Re-hash all files, not only changed ones")
+    parser.add_argument("--repair", action="store_true", help="Quarantine orphans and drop dangling rows")
+    parser.add_argument("--fresh", action="store_true", help="Discard an unfinished run")
+    parser.add_argument("--quarantine", default=QUARANTINE_ROOT, help="Where orphan files are moved")
+    parser.add_argument("--grace", type=int, default=3600, help="Don't quarantine files younger than this (s)")
+    parser.add_argument("--report", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = reconcile(args.state, args.workers, args.verify, args.repair, args.fresh, args.quarantine, args.grace)
+    print(f"✅ Run {report['run']}: {report['files_scanned']} files, {report['upload_rows']} upload rows, "
+          f"{report['csv_rows']} CSV rows in {report['seconds']}s")
+    for kind, count in report["issues"].items():
+        print(f"   {kind}: {count}")
+    for action, count in report["repaired"].items():
+        print(f"🔧 {action}: {count}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,9 +1,97 @@
 # storage.py
-import os, imghdr
+import os, re, time, uuid, fcntl, imghdr, hashlib, zipfile
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Optional
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
 UPLOAD_ROOT = os.environ.get("UPLOAD_DIR", "data/uploads")
+# Dummy S3 bucket and dummy Azure SQL table used by /api/upload
+DUMMY_S3_ROOT = os.environ.get("DUMMY_S3_DIR", os.path.join(os.path.dirname(__file__), "dummy_s3"))
+DUMMY_SQL_CSV = os.environ.get("DUMMY_SQL_CSV", os.path.join(os.path.dirname(__file__), "dummy_azure_sql.csv"))
+# Cold tier: immutable compressed pack objects (a local stand-in for an S3 bucket)
+# and the cache archived images are restored into on first read
+COLD_ROOT = os.environ.get("COLD_STORAGE_DIR", "data/cold")
+COLD_CACHE_ROOT = os.environ.get("COLD_CACHE_DIR", "data/cold_cache")
+# The cache lives on the hot volume: archive.py trims it to these limits
+COLD_CACHE_MAX_MB = int(os.environ.get("COLD_CACHE_MAX_MB", "2048"))
+COLD_CACHE_MAX_AGE_DAYS = int(os.environ.get("COLD_CACHE_MAX_AGE_DAYS", "30"))
+# A cache hit bumps the file's mtime at most this often, so eviction can go by mtime
+# (atime is unreliable on noatime/relatime mounts)
+COLD_CACHE_TOUCH_SECONDS = 600
+
+# Directory layout for new files under UPLOAD_ROOT and the dummy S3 bucket:
+#   flat          <name>                  (legacy, everything in one directory)
+#   hash          ab/cd/<name>            (first 4 hex chars of md5(name))
+#   farmer_month  <farmer_id>/<YYYY-MM>/<name>
+LAYOUTS = ("flat", "hash", "farmer_month")
+UPLOAD_LAYOUT = os.environ.get("UPLOAD_LAYOUT", "flat")
+if UPLOAD_LAYOUT not in LAYOUTS:
+    raise ValueError(f"UPLOAD_LAYOUT must be one of {LAYOUTS}, got {UPLOAD_LAYOUT!r}")
+
+_USER_IN_NAME = re.compile(r"_userID([A-Za-z0-9-]+)\.")
+
+@contextmanager
+def csv_lock(csv_path: str):
+    """
+    Exclusive advisory lock for appending to or swapping out a CSV file. It is taken
+    on a sidecar file, since a swap replaces the CSV's inode.
+    """
+    with open(f"{csv_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def shard_path(filename: str, user_id: str = None, when: datetime = None, layout: str = None) -> str:
+    """Relative path (with '/' separators) of a file named `filename` in the given layout"""
+    layout = layout or UPLOAD_LAYOUT
+    name = secure_filename(os.path.basename(filename)) or "unnamed"
+    if layout == "hash":
+        digest = hashlib.md5(name.encode()).hexdigest()
+        return f"{digest[:2]}/{digest[2:4]}/{name}"
+    if layout == "farmer_month":
+        if not user_id:
+            match = _USER_IN_NAME.search(name)
+            user_id = match.group(1) if match else None
+        farmer = secure_filename(str(user_id)) if user_id else "unknown"
+        return f"{farmer or 'unknown'}/{(when or datetime.utcnow()):%Y-%m}/{name}"
+    return name
+
+def resolve_path(root: str, rel: str) -> Optional[str]:
+    """
+    Find a stored file by its recorded relative path, falling back to where the
+    other layouts would have put it. Keeps old (e.g. flat) paths working while
+    files are being migrated. Returns the existing relative path, or None.
+    """
+    candidate = safe_join(root, rel)
+    if candidate and os.path.isfile(candidate):
+        return rel
+
+    name = os.path.basename(rel)
+    candidates = [shard_path(name, layout="flat"), shard_path(name, layout="hash")]
+    # farmer_month: the farmer is in save_image names (dummy S3 names have none and
+    # land in unknown/); the month has to be looked up
+    match = _USER_IN_NAME.search(name)
+    for farmer in ([match.group(1)] if match else []) + ["unknown"]:
+        farmer_dir = safe_join(root, farmer)
+        if farmer_dir and os.path.isdir(farmer_dir):
+            for month in sorted(os.listdir(farmer_dir), reverse=True):
+                candidates.append(f"{farmer}/{month}/{name}")
+
+    for alt in candidates:
+        path = safe_join(root, alt)
+        if alt != rel and path and os.path.isfile(path):
+            return alt
+    return None
+
+def ensure_parent(root: str, rel: str) -> str:
+    """Absolute path for `rel` under `root`, creating shard directories as needed"""
+    abs_path = os.path.join(os.path.abspath(root), *rel.split("/"))
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    return abs_path
 
 def save_image(file_storage, weight_kg: float, pig_uid: str, picture_number: int, user_id: str) -> tuple[str, str]:
     """
@@ -23,15 +111,98 @@ def save_image(file_storage, weight_kg: float, pig_uid: str, picture_number: int
     safe_user_id = secure_filename(str(user_id)) or "unknown"
     filename = f"{weight_kg:.2f}kg_uid{safe_pig_uid}_{picture_number}_userID{safe_user_id}.png"
     
-    # Save all files in UPLOAD_ROOT
-    upload_dir = os.path.abspath(UPLOAD_ROOT)
-    os.makedirs(upload_dir, exist_ok=True)
-
-    rel_path = filename
-    abs_path = os.path.join(upload_dir, filename)
+    # Save under UPLOAD_ROOT using the configured layout
+    rel_path = shard_path(filename, safe_user_id)
+    abs_path = ensure_parent(UPLOAD_ROOT, rel_path)
 
     with open(abs_path, "wb") as f:
         f.write(raw)
 
     file_storage.stream.seek(0)  # Reset stream
-    return rel_path, abs_path
\ No newline at end of file
+    return rel_path, abs_path
+
+def write_cold_pack(prefix: str, members: list[tuple[str, str]]) -> tuple[str, set]:
+    """
+    Pack (relative_path, absolute_path) files into a new zip object under COLD_ROOT/prefix.
+    Packs are written to a temp name and renamed, so readers never see a partial one.
+    Returns (object key, relative paths actually packed).
+    """
+    key = f"{prefix}/pack-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.zip"
+    abs_path = ensure_parent(COLD_ROOT, key)
+    tmp_path = f"{abs_path}.tmp"
+    packed = set()
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for rel_path, src in members:
+            try:
+                zf.write(src, arcname=rel_path)
+            except FileNotFoundError:
+                continue
+            packed.add(rel_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, abs_path)
+    return key, packed
+
+def restore_cold(cold_key: str, rel_path: str) -> Optional[str]:
+    """Extract an archived image into COLD_CACHE_ROOT (once) and return its absolute path"""
+    cache_root = os.path.abspath(COLD_CACHE_ROOT)
+    cached = safe_join(cache_root, rel_path)
+    if not cached:
+        return None
+    try:
+        st = os.stat(cached)
+        if time.time() - st.st_mtime > COLD_CACHE_TOUCH_SECONDS:
+            os.utime(cached)
+        return cached
+    except FileNotFoundError:
+        pass
+
+    pack = safe_join(os.path.abspath(COLD_ROOT), cold_key)
+    try:
+        with zipfile.ZipFile(pack) as zf, zf.open(rel_path) as src:
+            ensure_parent(cache_root, rel_path)
+            tmp_path = f"{cached}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "wb") as dst:
+                while chunk := src.read(1 << 20):
+                    dst.write(chunk)
+            os.replace(tmp_path, cached)
+    except (FileNotFoundError, KeyError, TypeError, zipfile.BadZipFile):
+        return None
+    return cached
+
+def evict_cold_cache(max_bytes: int, max_age_seconds: int) -> dict:
+    """
+    Delete restored images not read for max_age_seconds, then least recently read
+    ones until the cache fits in max_bytes. They are restored again on the next read.
+    """
+    cache_root = os.path.abspath(COLD_CACHE_ROOT)
+    stats = {"files": 0, "bytes": 0, "evicted": 0, "evicted_bytes": 0}
+    now = time.time()
+    entries = []
+    for dirpath, _, names in os.walk(cache_root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            # Leftovers of interrupted restores; live ones are only seconds old
+            if name.endswith(".tmp") and now - st.st_mtime < COLD_CACHE_TOUCH_SECONDS:
+                continue
+            entries.append((st.st_mtime, st.st_size, path, name.endswith(".tmp")))
+
+    entries.sort()
+    total = sum(size for _, size, _, _ in entries)
+    for mtime, size, path, tmp in entries:
+        if not tmp and now - mtime <= max_age_seconds and total <= max_bytes:
+            stats["files"] += 1
+            stats["bytes"] += size
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        stats["evicted"] += 1
+        stats["evicted_bytes"] += size
+    return stats